@@ -1,10 +1,14 @@
 import os
 import joblib
 import numpy as np
-import pandas as pd
 from collections import deque
 from scipy.special import expit
 
+try:
+    import bottleneck as bn  # C moving-window kernels
+except ImportError:
+    bn = None
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FEATURE_WINDOW = 10
 
@@ -17,16 +21,49 @@ MODEL_FILES = {
 _detectors = {}  # cache for Django runtime
 
 
+def _rolling_mean_std(x, window):
+    """
+    Trailing-window mean and sample std (ddof=1), matching pandas'
+    rolling(window, min_periods=1); a single-value window has std 0.
+    """
+    n = x.shape[0]
+    if bn is not None and n:
+        w = min(window, n)  # bottleneck rejects windows longer than the input
+        mean = bn.move_mean(x, w, min_count=1)
+        std = bn.move_std(x, w, min_count=1, ddof=1)
+        np.nan_to_num(std, copy=False)  # single-value windows -> 0
+        return mean, std
+
+    counts = np.minimum(np.arange(1, n + 1), window).astype(float)
+
+    # centre first so the running sums stay small (less cancellation)
+    centre = x.mean() if n else 0.0
+    xc = x - centre
+    c1 = np.concatenate(([0.0], np.cumsum(xc)))
+    c2 = np.concatenate(([0.0], np.cumsum(xc * xc)))
+
+    hi = np.arange(1, n + 1)
+    lo = hi - counts.astype(np.intp)
+    s1 = c1[hi] - c1[lo]
+    s2 = c2[hi] - c2[lo]
+
+    mean = s1 / counts + centre
+    var = np.zeros(n)
+    many = counts > 1
+    var[many] = (s2[many] - s1[many] * s1[many] / counts[many]) / (counts[many] - 1)
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+
 def engineer_features_matrix(values, window=FEATURE_WINDOW):
-    df = pd.DataFrame({"value": values.astype(float)})
+    values = np.asarray(values, dtype=float)
+
+    roll_mean, roll_std = _rolling_mean_std(values, window)
 
-    df["roll_mean"] = df["value"].rolling(window, min_periods=1).mean()
-    df["roll_std"] = df["value"].rolling(window, min_periods=1).std().fillna(0.0)
-    df["diff"] = df["value"].diff().fillna(0.0)
-    df["derivative"] = df["diff"].rolling(window, min_periods=1).mean().fillna(0.0)
+    diff = np.zeros_like(values)
+    diff[1:] = np.diff(values)
+    derivative, _ = _rolling_mean_std(diff, window)
 
-    df = df.bfill().ffill().fillna(0.0)
-    return df[["value", "roll_mean", "roll_std", "diff", "derivative"]].values
+    return np.column_stack((values, roll_mean, roll_std, diff, derivative))
 
 
 def engineer_features_last(context_values, window=FEATURE_WINDOW):
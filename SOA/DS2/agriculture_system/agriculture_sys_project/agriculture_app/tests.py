@@ -1,3 +1,256 @@
-from django.test import TestCase
+import contextlib
+import io
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from . import ml_model
+from .enumerations import SensorType
+from .models import FarmProfile, FieldPlot, SensorReading
+
+import train_isolation_forest_per_sensor as training
+
+
+class SensorReadingCreateTests(APITestCase):
+    """POST /api/sensor-readings/create/ and /api/sensor-readings/bulk/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="simulator", password="secret")
+        farm = FarmProfile.objects.create(owner=cls.user, location="North", size=2.5, crop_type="Wheat")
+        cls.plot = FieldPlot.objects.create(farm=farm, name="Plot 1", crop_variety="Durum")
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+        patcher = mock.patch("agriculture_app.views.run_anomaly_detection")
+        self.detect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reading(self, value, sensor_type=SensorType.TEMPERATURE):
+        return {
+            "plot": self.plot.id,
+            "sensor_type": sensor_type,
+            "value": value,
+            "simulated_time": "2025-01-01T06:00:00Z",
+        }
+
+    def detected_values(self):
+        return [call.args[0].value for call in self.detect.call_args_list]
+
+    def test_create_runs_detection(self):
+        response = self.client.post(reverse("sensor-reading-create"), self.reading(21.5), format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SensorReading.objects.count(), 1)
+        self.assertEqual(self.detected_values(), [21.5])
+
+    def test_bulk_create(self):
+        readings = [
+            self.reading(21.5),
+            self.reading(60.0, SensorType.HUMIDITY),
+            self.reading(35.0, SensorType.MOISTURE),
+        ]
+        response = self.client.post(reverse("sensor-reading-bulk-create"), {"readings": readings}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(SensorReading.objects.count(), 3)
+        # detection runs in submission order (per-plot rolling window)
+        self.assertEqual(self.detected_values(), [21.5, 60.0, 35.0])
+
+    def test_bulk_create_accepts_bare_list(self):
+        readings = [self.reading(21.5), self.reading(22.0)]
+        response = self.client.post(reverse("sensor-reading-bulk-create"), readings, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SensorReading.objects.count(), 2)
+        self.assertEqual(self.detected_values(), [21.5, 22.0])
+
+    def test_bulk_create_rejects_non_list(self):
+        response = self.client.post(reverse("sensor-reading-bulk-create"), {"readings": 5}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("readings", response.data)
+        self.assertFalse(SensorReading.objects.exists())
+        self.detect.assert_not_called()
+
+    def test_bulk_create_rejects_whole_batch_on_invalid_item(self):
+        readings = [self.reading(21.5), self.reading(22.0, "PRESSURE")]
+        response = self.client.post(reverse("sensor-reading-bulk-create"), {"readings": readings}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(SensorReading.objects.exists())
+        self.detect.assert_not_called()
+
+    def test_bulk_create_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.post(
+            reverse("sensor-reading-bulk-create"), {"readings": [self.reading(21.5)]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(SensorReading.objects.exists())
+
+
+class RollingMeanStdTests(SimpleTestCase):
+    """ml_model._rolling_mean_std() against pandas' rolling(window, min_periods=1)."""
+
+    CASES = [
+        # (values, window)
+        ([1.0, 2.0, 4.0, 8.0], 1),  # one-value windows: std 0
+        ([1.0, 2.0, 4.0, 8.0], 2),
+        ([1.0, 2.0, 4.0, 8.0], 10),  # window longer than the input
+        ([5.0], 3),
+        ([], 3),
+        (list(np.random.default_rng(0).normal(20.0, 5.0, 200)), 10),
+    ]
+
+    def paths(self):
+        # the bottleneck kernels (when installed) and the cumsum fallback
+        if ml_model.bn is not None:
+            yield "bottleneck"
+        with mock.patch.object(ml_model, "bn", None):
+            yield "cumsum"
+
+    def test_matches_pandas(self):
+        for path in self.paths():
+            for values, window in self.CASES:
+                with self.subTest(path=path, n=len(values), window=window):
+                    x = np.array(values, dtype=float)
+                    rolling = pd.Series(x, dtype=float).rolling(window, min_periods=1)
+
+                    mean, std = ml_model._rolling_mean_std(x, window)
+
+                    np.testing.assert_allclose(mean, rolling.mean().to_numpy(), rtol=1e-9, atol=1e-12)
+                    np.testing.assert_allclose(std, rolling.std(ddof=1).fillna(0.0).to_numpy(), rtol=1e-9, atol=1e-12)
+
+    def test_known_values(self):
+        x = np.array([1.0, 2.0, 4.0, 8.0])
+        for path in self.paths():
+            with self.subTest(path=path):
+                mean, std = ml_model._rolling_mean_std(x, 2)
+
+                np.testing.assert_allclose(mean, [1.0, 1.5, 3.0, 6.0])
+                np.testing.assert_allclose(std, [0.0, np.sqrt(0.5), np.sqrt(2.0), np.sqrt(8.0)])
+
+
+class TrainingFeaturesTests(TestCase):
+    """build_features() / cached_features() in train_isolation_forest_per_sensor.py"""
+
+    SENSOR = SensorType.TEMPERATURE
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="farmer", password="secret")
+        farm = FarmProfile.objects.create(owner=user, location="North", size=2.5, crop_type="Wheat")
+        cls.plots = [
+            FieldPlot.objects.create(farm=farm, name=f"Plot {i}", crop_variety="Durum") for i in range(4)
+        ]
+        # history length per plot; the last one is too short to be used
+        lengths = [45, 20, 33, training.FEATURE_WINDOW * 2 - 1]
+
+        # readings of every plot (and another sensor) interleaved in time,
+        # so a per-plot slice only comes out right if the grouping is right
+        rng = np.random.default_rng(0)
+        base = timezone.now() - timedelta(days=1)
+        readings = []
+        for step in range(max(lengths)):
+            for plot, length in zip(cls.plots, lengths):
+                if step < length:
+                    readings.append((plot, cls.SENSOR, 10.0 * plot.id + rng.normal()))
+                    readings.append((plot, SensorType.HUMIDITY, 60.0 + rng.normal()))
+        for i, (plot, sensor_type, value) in enumerate(readings):
+            reading = SensorReading.objects.create(
+                plot=plot, sensor_type=sensor_type, value=value, simulated_time=base
+            )
+            # timestamp is auto_now_add: set distinct, increasing times afterwards
+            SensorReading.objects.filter(pk=reading.pk).update(timestamp=base + timedelta(seconds=i))
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patcher = mock.patch.object(training, "APP_DIR", cache_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        stdout = contextlib.redirect_stdout(io.StringIO())  # the scripts print progress
+        stdout.__enter__()
+        self.addCleanup(stdout.__exit__, None, None, None)
+
+    def expected_features(self):
+        # one query per plot, as before the single-query rewrite
+        matrices = []
+        for plot in self.plots:
+            values = list(
+                SensorReading.objects.filter(plot=plot, sensor_type=self.SENSOR)
+                .order_by("timestamp")
+                .values_list("value", flat=True)
+            )
+            if len(values) >= training.FEATURE_WINDOW * 2:
+                matrices.append(training.engineer_features(values))
+        return matrices
+
+    def cached_features(self):
+        with mock.patch.object(training, "build_features", wraps=training.build_features) as build:
+            X, used_plots = training.cached_features(self.SENSOR)
+        return X, used_plots, build.called
+
+    def test_build_features_matches_per_plot_queries(self):
+        X, used_plots = training.build_features(self.SENSOR)
+
+        expected = self.expected_features()
+        self.assertEqual(used_plots, 3)
+        self.assertEqual(len(expected), 3)
+        np.testing.assert_array_equal(X, np.vstack(expected))
+
+    def test_build_features_without_enough_history(self):
+        SensorReading.objects.exclude(plot=self.plots[-1]).delete()
+
+        self.assertEqual(training.build_features(self.SENSOR), (None, 0))
+
+    def test_cache_is_reused(self):
+        X, used_plots, built = self.cached_features()
+        self.assertTrue(built)
+
+        X_again, used_again, built = self.cached_features()
+        self.assertFalse(built)
+        self.assertEqual(used_again, used_plots)
+        np.testing.assert_array_equal(X_again, X)
+
+    def test_new_reading_invalidates_cache(self):
+        X, _, _ = self.cached_features()
+
+        SensorReading.objects.create(
+            plot=self.plots[0], sensor_type=self.SENSOR, value=99.0, simulated_time=timezone.now()
+        )
+        X_new, _, built = self.cached_features()
+
+        self.assertTrue(built)
+        self.assertEqual(len(X_new), len(X) + 1)
+
+    def test_other_sensor_keeps_cache(self):
+        self.cached_features()
+
+        SensorReading.objects.create(
+            plot=self.plots[0], sensor_type=SensorType.HUMIDITY, value=61.0, simulated_time=timezone.now()
+        )
+        _, _, built = self.cached_features()
+
+        self.assertFalse(built)
+
+    def test_features_version_invalidates_cache(self):
+        self.cached_features()
+
+        with mock.patch.object(training, "FEATURES_VERSION", training.FEATURES_VERSION + 1):
+            _, _, built = self.cached_features()
+
+        self.assertTrue(built)
@@ -5,6 +5,7 @@ from .views import (
     PlotDetailView,
     PlotByFarmView,
     SensorReadingCreateView,
+    SensorReadingBulkCreateView,
     SensorReadingListView,
     AnomalyListView,
     RecommendationListView
@@ -20,6 +21,7 @@ urlpatterns = [
     # Sensor Readings (GET list, POST create)
     path("sensor-readings/", SensorReadingListView.as_view(), name="sensor-reading-list"),
     path("sensor-readings/create/", SensorReadingCreateView.as_view(), name="sensor-reading-create"),
+    path("sensor-readings/bulk/", SensorReadingBulkCreateView.as_view(), name="sensor-reading-bulk-create"),
 
     # Anomalies
     path("anomalies/", AnomalyListView.as_view(), name="anomaly-list"),
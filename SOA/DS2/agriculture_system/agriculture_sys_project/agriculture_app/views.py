@@ -1,6 +1,7 @@
 # views.py
 # OPTIMIZED: Added magnitude filtering to reduce false positives
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
 from .enumerations import AnomalyType, SeverityLevel, AgentConfidence
 from .ml_model import get_detector
 from .agent_module import generate_recommendation
@@ -90,6 +91,123 @@ class PlotByFarmView(generics.ListAPIView):
         return qs.filter(farm__owner=user)
 
 
+# ---------------------------------------------------
+# ANOMALY DETECTION (shared by single and bulk create)
+# ---------------------------------------------------
+def run_anomaly_detection(instance):
+    """Score a freshly saved SensorReading and, if confirmed, record the anomaly."""
+    # Get detector for this sensor type
+    detector = get_detector(instance.sensor_type)
+    
+    if detector is None:
+        print(f"⚠ ML model missing for {instance.sensor_type}, skipping anomaly detection")
+        return
+
+    # Predict anomaly using proper feature engineering
+    plot_id = instance.plot.id
+    try:
+        is_anomaly, confidence_score = detector.predict(
+            plot_id=plot_id,
+            sensor_type=instance.sensor_type,
+            value=instance.value
+        )
+    except Exception as e:
+        print(f"⚠ Prediction failed for {instance.sensor_type}: {e}")
+        is_anomaly = False
+        confidence_score = 0.0
+
+    # Only proceed if ML model flags it as anomaly
+    if not is_anomaly:
+        return
+
+    # ============================================================
+    # MAGNITUDE FILTER: Reduce false positives on borderline values
+    # Only create anomaly event if value is significantly outside
+    # normal range (not just slightly unusual)
+    # ============================================================
+    
+    # Define normal operating ranges (center points)
+    normal_ranges = {
+        "TEMPERATURE": (18, 28),  # Normal: 18-28°C
+        "HUMIDITY": (50, 75),     # Normal: 50-75%
+        "MOISTURE": (40, 70),     # Normal: 40-70%
+    }
+    
+    # Magnitude thresholds: how far outside normal range to flag
+    magnitude_thresholds = {
+        "TEMPERATURE": 3.0,  # Must be ±3°C outside range
+        "HUMIDITY": 8.0,     # Must be ±8% outside range
+        "MOISTURE": 8.0,     # Must be ±8% outside range
+    }
+    
+    min_val, max_val = normal_ranges.get(instance.sensor_type, (0, 100))
+    threshold = magnitude_thresholds.get(instance.sensor_type, 5.0)
+    
+    # Check if value is significantly outside normal range
+    is_significantly_low = instance.value < (min_val - threshold)
+    is_significantly_high = instance.value > (max_val + threshold)
+    
+    if not (is_significantly_low or is_significantly_high):
+        print(
+            f"⚠️ Anomaly dismissed (insufficient magnitude): "
+            f"{instance.sensor_type}={instance.value:.2f} "
+            f"(normal range: {min_val}-{max_val}, threshold: ±{threshold})"
+        )
+        return
+    
+    # ============================================================
+    # ANOMALY CONFIRMED - Create event
+    # ============================================================
+    
+    print(
+        f"🔥 Anomaly confirmed: {instance.sensor_type} "
+        f"value={instance.value:.2f} plot={plot_id} "
+        f"confidence={confidence_score:.4f}"
+    )
+
+    # Determine anomaly type based on value and sensor type
+    anomaly_map = {
+        "TEMPERATURE": (
+            AnomalyType.HIGH_TEMPERATURE
+            if instance.value > max_val
+            else AnomalyType.LOW_TEMPERATURE
+        ),
+        "HUMIDITY": (
+            AnomalyType.HIGH_HUMIDITY
+            if instance.value > max_val
+            else AnomalyType.LOW_HUMIDITY
+        ),
+        "MOISTURE": (
+            AnomalyType.HIGH_MOISTURE
+            if instance.value > max_val
+            else AnomalyType.LOW_MOISTURE
+        ),
+    }
+    anomaly_type = anomaly_map.get(instance.sensor_type, AnomalyType.HIGH_TEMPERATURE)
+
+    # Determine severity based on confidence score
+    if confidence_score < 0.65:
+        severity = SeverityLevel.LOW
+    elif confidence_score < 0.80:
+        severity = SeverityLevel.MEDIUM
+    else:
+        severity = SeverityLevel.HIGH
+
+    # Create anomaly event
+    anomaly_event = AnomalyEvent.objects.create(
+        simulated_time=instance.simulated_time,
+        plot=instance.plot,
+        anomaly_type=anomaly_type,
+        severity=severity,
+        model_confidence=min(confidence_score, 1.0),
+    )
+    
+    print(f"✅ Created AnomalyEvent #{anomaly_event.id} with severity {severity}")
+
+    # Trigger AI agent recommendation
+    generate_recommendation(anomaly_event)
+
+
 # ---------------------------------------------------
 # POST SENSOR DATA (Simulator → Django)
 # POST /api/sensor-readings/
@@ -100,117 +218,42 @@ class SensorReadingCreateView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         instance = serializer.save()
+        run_anomaly_detection(instance)
 
-        # Get detector for this sensor type
-        detector = get_detector(instance.sensor_type)
-        
-        if detector is None:
-            print(f"⚠ ML model missing for {instance.sensor_type}, skipping anomaly detection")
-            return
-
-        # Predict anomaly using proper feature engineering
-        plot_id = instance.plot.id
-        try:
-            is_anomaly, confidence_score = detector.predict(
-                plot_id=plot_id,
-                sensor_type=instance.sensor_type,
-                value=instance.value
-            )
-        except Exception as e:
-            print(f"⚠ Prediction failed for {instance.sensor_type}: {e}")
-            is_anomaly = False
-            confidence_score = 0.0
-
-        # Only proceed if ML model flags it as anomaly
-        if not is_anomaly:
-            return
-
-        # ============================================================
-        # MAGNITUDE FILTER: Reduce false positives on borderline values
-        # Only create anomaly event if value is significantly outside
-        # normal range (not just slightly unusual)
-        # ============================================================
-        
-        # Define normal operating ranges (center points)
-        normal_ranges = {
-            "TEMPERATURE": (18, 28),  # Normal: 18-28°C
-            "HUMIDITY": (50, 75),     # Normal: 50-75%
-            "MOISTURE": (40, 70),     # Normal: 40-70%
-        }
-        
-        # Magnitude thresholds: how far outside normal range to flag
-        magnitude_thresholds = {
-            "TEMPERATURE": 3.0,  # Must be ±3°C outside range
-            "HUMIDITY": 8.0,     # Must be ±8% outside range
-            "MOISTURE": 8.0,     # Must be ±8% outside range
-        }
-        
-        min_val, max_val = normal_ranges.get(instance.sensor_type, (0, 100))
-        threshold = magnitude_thresholds.get(instance.sensor_type, 5.0)
-        
-        # Check if value is significantly outside normal range
-        is_significantly_low = instance.value < (min_val - threshold)
-        is_significantly_high = instance.value > (max_val + threshold)
-        
-        if not (is_significantly_low or is_significantly_high):
-            print(
-                f"⚠️ Anomaly dismissed (insufficient magnitude): "
-                f"{instance.sensor_type}={instance.value:.2f} "
-                f"(normal range: {min_val}-{max_val}, threshold: ±{threshold})"
+
+# ---------------------------------------------------
+# POST MANY SENSOR READINGS AT ONCE (Simulator → Django)
+# POST /api/sensor-readings/bulk/
+# Body: {"readings": [<reading>, ...]} or the bare list [<reading>, ...]
+# ---------------------------------------------------
+class SensorReadingBulkCreateView(generics.GenericAPIView):
+    serializer_class = SensorReadingSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        # Either {"readings": [...]} or the bare list
+        readings = request.data.get("readings") if isinstance(request.data, dict) else request.data
+        if not isinstance(readings, list):
+            return Response(
+                {"readings": ["Expected a list of sensor readings."]},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            return
-        
-        # ============================================================
-        # ANOMALY CONFIRMED - Create event
-        # ============================================================
-        
-        print(
-            f"🔥 Anomaly confirmed: {instance.sensor_type} "
-            f"value={instance.value:.2f} plot={plot_id} "
-            f"confidence={confidence_score:.4f}"
-        )
 
-        # Determine anomaly type based on value and sensor type
-        anomaly_map = {
-            "TEMPERATURE": (
-                AnomalyType.HIGH_TEMPERATURE
-                if instance.value > max_val
-                else AnomalyType.LOW_TEMPERATURE
-            ),
-            "HUMIDITY": (
-                AnomalyType.HIGH_HUMIDITY
-                if instance.value > max_val
-                else AnomalyType.LOW_HUMIDITY
-            ),
-            "MOISTURE": (
-                AnomalyType.HIGH_MOISTURE
-                if instance.value > max_val
-                else AnomalyType.LOW_MOISTURE
-            ),
-        }
-        anomaly_type = anomaly_map.get(instance.sensor_type, AnomalyType.HIGH_TEMPERATURE)
-
-        # Determine severity based on confidence score
-        if confidence_score < 0.65:
-            severity = SeverityLevel.LOW
-        elif confidence_score < 0.80:
-            severity = SeverityLevel.MEDIUM
-        else:
-            severity = SeverityLevel.HIGH
-
-        # Create anomaly event
-        anomaly_event = AnomalyEvent.objects.create(
-            simulated_time=instance.simulated_time,
-            plot=instance.plot,
-            anomaly_type=anomaly_type,
-            severity=severity,
-            model_confidence=min(confidence_score, 1.0),
+        serializer = self.get_serializer(data=readings, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        # One INSERT for the whole batch, then detection in submission order
+        # (the detector keeps a per-plot rolling window)
+        instances = SensorReading.objects.bulk_create(
+            [SensorReading(**item) for item in serializer.validated_data]
         )
-        
-        print(f"✅ Created AnomalyEvent #{anomaly_event.id} with severity {severity}")
+        for instance in instances:
+            run_anomaly_detection(instance)
 
-        # Trigger AI agent recommendation
-        generate_recommendation(anomaly_event)
+        return Response(
+            self.get_serializer(instances, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
 
 
 # ---------------------------------------------------
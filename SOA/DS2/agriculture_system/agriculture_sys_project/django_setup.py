@@ -0,0 +1,19 @@
+import os
+from dotenv import load_dotenv
+import django
+
+_SETUP_DONE = False
+
+
+def ensure_django_setup():
+    """
+    Load .env and run django.setup() for the standalone scripts, on the first
+    call only (a tuning driver may call train_model() many times).
+    """
+    global _SETUP_DONE
+    if _SETUP_DONE:
+        return
+    load_dotenv()  # .env from the current directory (or searched up the dir tree)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agriculture_sys_project.settings")
+    django.setup()
+    _SETUP_DONE = True
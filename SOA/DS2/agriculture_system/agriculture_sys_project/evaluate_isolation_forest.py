@@ -2,17 +2,12 @@ import os
 import pandas as pd
 import numpy as np
 from sklearn.metrics import precision_score, recall_score, f1_score, confusion_matrix, classification_report
-import django
-
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agriculture_sys_project.settings")
-django.setup()
 
 from agriculture_app.ml_model import create_detector
 
 CSV_PATH = "ground_truth_anomalies.csv"
 SENSORS = ["TEMPERATURE", "HUMIDITY", "MOISTURE"]
 
-
 def evaluate_sensor(sensor_type: str, df: pd.DataFrame):
     print(f"\n{'='*70}")
     print(f"📊 Evaluating {sensor_type} (PRODUCTION LOGIC)")
@@ -1,16 +1,8 @@
-import os
-from dotenv import load_dotenv
-import django
 import pandas as pd
 import numpy as np
 
-# Django setup
-load_dotenv()  # This loads .env from the current directory (or searches up the dir tree)
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agriculture_sys_project.settings")
-django.setup()
-
-from agriculture_app.models import SensorReading
 from agriculture_app.ml_model import get_detector
+from django_setup import ensure_django_setup
 
 
 def export_dataset():
@@ -18,6 +10,9 @@ def export_dataset():
     Export sensor readings with anomaly labels using proper feature engineering.
     Maintains context per plot-sensor combination for accurate detection.
     """
+    ensure_django_setup()
+    from agriculture_app.models import SensorReading
+
     print("📥 Loading SensorReadings...")
     
     readings = SensorReading.objects.all().order_by("timestamp", "plot_id", "sensor_type")
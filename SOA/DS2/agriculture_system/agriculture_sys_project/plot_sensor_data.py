@@ -1,6 +1,8 @@
 # plot_sensor_data.py
 # New version: per sensor, colored by plot, with anomalies highlighted
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # figures are only saved to PNG; no GUI backend
 import matplotlib.pyplot as plt
 
 df = pd.read_csv("ground_truth_anomalies.csv")
@@ -58,6 +60,7 @@ def plot_sensor_by_plot(sensor_type):
     plt.grid(True)
     out_name = f"{sensor_type.lower()}_per_plot_with_anomalies.png"
     plt.savefig(out_name)
+    plt.close()
     print(f"📈 Saved {out_name}")
 
 
@@ -1,35 +1,20 @@
 import os
-from dotenv import load_dotenv
-import django
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import RobustScaler
 import joblib
 
-load_dotenv()
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agriculture_sys_project.settings")
-django.setup()
-
-from agriculture_app.models import SensorReading
+from agriculture_app.ml_model import FEATURE_WINDOW, engineer_features_matrix as engineer_features
+from django_setup import ensure_django_setup
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 APP_DIR = os.path.join(BASE_DIR, "agriculture_app")
 
-FEATURE_WINDOW = 10  # must match ml_model/eval
-
-
-def engineer_features(values):
-    df = pd.DataFrame({"value": values})
-
-    df["roll_mean"] = df["value"].rolling(FEATURE_WINDOW, min_periods=1).mean()
-    df["roll_std"] = df["value"].rolling(FEATURE_WINDOW, min_periods=1).std().fillna(0.0)
-    df["diff"] = df["value"].diff().fillna(0.0)
-    df["derivative"] = df["diff"].rolling(FEATURE_WINDOW, min_periods=1).mean().fillna(0.0)
-
-    df = df.bfill().ffill().fillna(0.0)
-    return df[["value", "roll_mean", "roll_std", "diff", "derivative"]].values
+_ROW_DTYPE = np.dtype([("plot_id", np.int32), ("value", np.float64)])
 
+# Part of the feature cache key: bump whenever build_features() or
+# ml_model.engineer_features_matrix() change what they compute
+FEATURES_VERSION = 1
 
 # OPTIMIZED CONFIGURATION - Reduces FP while maintaining recall
 SENSOR_CFG = {
@@ -57,46 +42,97 @@ SENSOR_CFG = {
 }
 
 
-def train_model(sensor_type, filename):
-    print(f"\n{'='*60}")
-    print(f"🔥 Training Isolation Forest for {sensor_type}...")
-    print(f"{'='*60}")
-
-    cfg = SENSOR_CFG.get(sensor_type, {"train_cont": 0.005, "start_q": 0.01, "stop_q": 0.04, "k": 3})
+def build_features(sensor_type):
+    """Engineered features of every plot with enough history, stacked into one matrix."""
+    from agriculture_app.models import SensorReading
 
-    plot_ids = (
+    # One query for the whole sensor type, streamed straight into an array
+    # (no list of row tuples) and grouped per plot in NumPy
+    rows = np.fromiter(
         SensorReading.objects.filter(sensor_type=sensor_type)
-        .values_list("plot_id", flat=True)
-        .distinct()
+        .order_by("plot_id", "timestamp")
+        .values_list("plot_id", "value")
+        .iterator(),
+        dtype=_ROW_DTYPE,
     )
+    pids = rows["plot_id"]
+    vals = np.ascontiguousarray(rows["value"])
+
+    # rows are sorted by plot_id, so each plot is one contiguous slice
+    plot_ids, starts = np.unique(pids, return_index=True)
+    ends = np.append(starts[1:], len(pids))
 
     all_features = []
     used_plots = 0
 
     print(f"   Processing {len(plot_ids)} plots...")
 
-    for pid in plot_ids:
-        qs_plot = SensorReading.objects.filter(sensor_type=sensor_type, plot_id=pid).order_by("timestamp")
-
-        if qs_plot.count() < FEATURE_WINDOW * 2:
+    for lo, hi in zip(starts, ends):
+        if hi - lo < FEATURE_WINDOW * 2:
             continue
 
-        values = np.array([x.value for x in qs_plot], dtype=float)
+        values = vals[lo:hi]
         X_plot = engineer_features(values)
         all_features.append(X_plot)
         used_plots += 1
 
     if not all_features:
+        return None, 0
+    return np.vstack(all_features), used_plots
+
+
+def cached_features(sensor_type):
+    """
+    build_features() behind an .npz cache in APP_DIR.
+    The cache is reused as long as the newest reading and row count for the
+    sensor (and FEATURES_VERSION) are unchanged, so re-tuning thresholds skips
+    the SQL + feature stage.
+    """
+    from django.db.models import Count, Max
+    from agriculture_app.models import SensorReading
+
+    stats = SensorReading.objects.filter(sensor_type=sensor_type).aggregate(
+        latest=Max("timestamp"), rows=Count("id")
+    )
+    if stats["latest"] is None:
+        return None, 0
+
+    key = np.array([stats["latest"].timestamp(), stats["rows"], FEATURE_WINDOW, FEATURES_VERSION], dtype=float)
+    cache_path = os.path.join(APP_DIR, f"features_{sensor_type.lower()}.npz")
+
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as npz:
+            if np.array_equal(npz["key"], key):
+                print(f"   Reusing cached features → {cache_path}")
+                return npz["X"], int(npz["used_plots"])
+
+    X, used_plots = build_features(sensor_type)
+    if X is not None:
+        np.savez(cache_path, X=X, used_plots=used_plots, key=key)
+    return X, used_plots
+
+
+def train_model(sensor_type, filename):
+    ensure_django_setup()
+
+    print(f"\n{'='*60}")
+    print(f"🔥 Training Isolation Forest for {sensor_type}...")
+    print(f"{'='*60}")
+
+    cfg = SENSOR_CFG.get(sensor_type, {"train_cont": 0.005, "start_q": 0.01, "stop_q": 0.04, "k": 3})
+
+    X, used_plots = cached_features(sensor_type)
+    if X is None:
         print(f"⚠ No sufficient data per plot for {sensor_type}.")
         return
 
-    X = np.vstack(all_features)
     print(f"   Used plots: {used_plots}")
     print(f"   Combined Feature matrix shape: {X.shape}")
     print(f"   Features: [value, roll_mean, roll_std, diff, derivative]")
 
     scaler = RobustScaler()
-    X_scaled = scaler.fit_transform(X)
+    # Column-major: each tree node scans a single feature column contiguously
+    X_scaled = np.asfortranarray(scaler.fit_transform(X))
 
     train_cont = float(cfg["train_cont"])
     print(f"   Training Isolation Forest (train_contamination={train_cont})...")
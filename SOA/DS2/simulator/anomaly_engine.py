@@ -1,104 +1,219 @@
 # anomaly_engine.py
-import random
+import logging
+
 import numpy as np
 import SOA.DS2.simulator.config as config
 
+log = logging.getLogger(__name__)
+
+# Trigger settings bound once at import (maybe_trigger_batch runs every step);
+# enabled anomalies are pre-resolved to (name, type code) pairs
+ANOMALY_CHANCE = config.ANOMALY_CHANCE
+ENABLED_ANOMALIES = tuple((name, config.ANOMALY_CODES[name]) for name in config.ENABLED_ANOMALIES)
+
+# (anomaly type code, sensor code) -> (op, low, high)
+#   "add"/"sub": +/- uniform(low, high)
+#   "normal":    + normal(low, high)
+#   "freeze":    hold the first value seen
+#   "drift":     constant offset of uniform(low, high) magnitude, random sign
+EFFECTS = {
+    (config.HIGH_TEMPERATURE, config.TEMP): ("add", 5, 10),
+    (config.LOW_TEMPERATURE, config.TEMP): ("sub", 5, 10),
+    (config.HIGH_HUMIDITY, config.HUM): ("add", 8, 15),
+    (config.LOW_HUMIDITY, config.HUM): ("sub", 8, 15),
+    (config.HIGH_MOISTURE, config.MOIST): ("add", 10, 20),
+    (config.LOW_MOISTURE, config.MOIST): ("sub", 10, 20),
+}
+for _code in range(config.N_SENSORS):
+    EFFECTS[(config.SENSOR_FREEZE, _code)] = ("freeze", 0, 0)
+    EFFECTS[(config.NOISE_INJECTION, _code)] = ("normal", 0, 15)
+    EFFECTS[(config.SENSOR_DRIFT, _code)] = ("drift", 0.5, 1.0)
+
+
+class _ActiveAnomaly:
+    """The anomaly currently running on one plot."""
+
+    __slots__ = ("type", "duration", "step", "offsets")
+
+    def __init__(self, type_code, duration, offsets):
+        self.type = type_code
+        self.duration = duration
+        self.step = 0  # index into offsets, advanced by end_step()
+        self.offsets = offsets  # offsets[step][sensor_code], rolled at trigger time
+
+
+def _roll_offsets(rng, type_code, duration):
+    """
+    Draw every random number an anomaly will need, up front:
+    a (duration, N_SENSORS) table of additive offsets (zero where the
+    anomaly does not touch the sensor). Returned as nested lists so plan()
+    copies one step's row with a plain list index.
+    """
+    offsets = np.zeros((duration, config.N_SENSORS))
+    for sensor_code in range(config.N_SENSORS):
+        effect = EFFECTS.get((type_code, sensor_code))
+        if effect is None:
+            continue
+        op, low, high = effect
+        if op == "add":
+            offsets[:, sensor_code] = rng.uniform(low, high, size=duration)
+        elif op == "sub":
+            offsets[:, sensor_code] = -rng.uniform(low, high, size=duration)
+        elif op == "normal":
+            offsets[:, sensor_code] = rng.normal(low, high, size=duration)
+        elif op == "drift":
+            # Bidirectional drift (up or down), avoiding tiny drifts
+            offsets[:, sensor_code] = rng.choice((-1.0, 1.0)) * rng.uniform(low, high)
+    return offsets.tolist()
+
+
+# One row per triggered anomaly (see AnomalyEngine.log); type is the type code,
+# step is -1 when maybe_trigger_batch() is called outside plan()
+LOG_DTYPE = np.dtype([("step", np.int32), ("plot", np.int32), ("type", np.int8)])
+
+# Anomaly types that hold values (on every sensor, see EFFECTS)
+FREEZE_TYPES = frozenset(type_code for (type_code, _), (op, _, _) in EFFECTS.items() if op == "freeze")
+
+
+class AnomalyTimeline:
+    """
+    A whole run's anomalies, rolled up front by AnomalyEngine.plan()
+    (row = step, column = plot position in plot_ids).
+    """
+
+    __slots__ = ("offsets", "hold", "labels")
+
+    def __init__(self, n_steps, n_plots):
+        self.offsets = np.zeros((n_steps, n_plots, config.N_SENSORS))  # added to every reading
+        self.hold = np.full((n_steps, n_plots), -1)  # SENSOR_FREEZE: step whose values are held, else -1
+        self.labels = np.full((n_steps, n_plots), -1, dtype=np.int8)  # ground-truth type code, -1 = none
+
 
 class AnomalyEngine:
     """
     Handles anomaly injection for the simulator.
     Each active anomaly is tracked per plot.
+    rng: numpy Generator for every random draw, triggers included (pass the
+    simulator's to share its seed).
     """
 
-    def __init__(self):
-        self.active = {}  # {plot_id: {"type": ..., "duration": ..., ...}}
-        self.log = []  # chronological list of triggered anomalies
+    def __init__(self, rng=None):
+        # Indexed by plot id (small ints): _ActiveAnomaly or None
+        self.active = [None] * (max(config.PLOT_IDS) + 1)
+        self.n_active = 0
+        self._log = np.empty(64, dtype=LOG_DTYPE)  # grown by doubling, see log
+        self._n_log = 0
         self.scenarios_used = set()
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self._events = []  # ("START" | "END", plot_id, type name, step), see flush_events()
+        self._step = None  # step being planned by plan(), None outside it
+
+    @property
+    def log(self):
+        """Chronological triggered anomalies: LOG_DTYPE structured array (a view, no copy)."""
+        return self._log[:self._n_log]
 
     # ----------------------------------------------------------
     # Random anomaly trigger
     # ----------------------------------------------------------
-    def maybe_trigger(self, plot_id):
+    def maybe_trigger_batch(self, plot_ids):
         """
-        With a small probability, start a new anomaly on this plot.
-        If an anomaly is already active, keep the current one.
+        With a small probability, start a new anomaly on each plot of a
+        step (one draw from self.rng for all of them). Plots that already
+        have an active anomaly keep it.
         """
-        if plot_id in self.active:
-            return
-
-        if random.random() < config.ANOMALY_CHANCE:
-            anomaly = random.choice(config.ENABLED_ANOMALIES)
-            self.active[plot_id] = {
-                "type": anomaly,
-                "duration": random.randint(3, 8),
-                "params": {}  # Per-sensor parameters
-            }
-            self.log.append({"plot": plot_id, "type": anomaly})
-            self.scenarios_used.add(anomaly)
-            print(f"🔥 [ANOMALY START] Plot {plot_id}: {anomaly}")
+        rolls = self.rng.random(len(plot_ids)).tolist()
+        active = self.active
+        for plot_id, roll in zip(plot_ids, rolls):
+            if roll < ANOMALY_CHANCE and active[plot_id] is None:
+                self._start(plot_id)
 
     # ----------------------------------------------------------
-    # Apply anomaly to value
+    # Whole-run timeline (triggers never depend on sensor values)
     # ----------------------------------------------------------
-    def apply(self, plot_id, sensor_type, value):
+    def plan(self, n_steps, plot_ids):
         """
-        Apply anomaly effect (if any) to the given sensor value.
-        sensor_type is one of: "temperature", "humidity", "moisture"
+        Run the trigger/end_step cycle for every step up front and record
+        its effect as arrays, so readings can be modified in one pass by
+        apply_timeline(). Log entries and events are tagged with their step.
         """
-        if plot_id not in self.active:
-            return value
-
-        anomaly = self.active[plot_id]
-        params = anomaly["params"]
-        anomaly_type = anomaly["type"]
-
-        # -------------------------------
-        # Amplitude-tuned anomalies (STRONGER)
-        # -------------------------------
-        if anomaly_type == "HIGH_TEMPERATURE" and sensor_type == "temperature":
-            value += np.random.uniform(5, 10)
-
-        elif anomaly_type == "LOW_TEMPERATURE" and sensor_type == "temperature":
-            value -= np.random.uniform(5, 10)
-
-        elif anomaly_type == "HIGH_HUMIDITY" and sensor_type == "humidity":
-            value += np.random.uniform(8, 15)
-
-        elif anomaly_type == "LOW_HUMIDITY" and sensor_type == "humidity":
-            value -= np.random.uniform(8, 15)
-
-        elif anomaly_type == "HIGH_MOISTURE" and sensor_type == "moisture":
-            value += np.random.uniform(10, 20)
-
-        elif anomaly_type == "LOW_MOISTURE" and sensor_type == "moisture":
-            value -= np.random.uniform(10, 20)
-
-        elif anomaly_type == "SENSOR_FREEZE":
-            if sensor_type not in params:
-                params[sensor_type] = {"freeze_value": value}
-            value = params[sensor_type]["freeze_value"]
-
-        elif anomaly_type == "NOISE_INJECTION":
-            value += np.random.normal(0, 15)
-
-        elif anomaly_type == "SENSOR_DRIFT":
-            if sensor_type not in params:
-                # Bidirectional drift (up or down), avoiding tiny drifts
-                drift = np.random.uniform(-1.0, 1.0)
-                while abs(drift) < 0.5:
-                    drift = np.random.uniform(-1.0, 1.0)
-                params[sensor_type] = {"drift": drift}
-            value += params[sensor_type]["drift"]
-
-        return float(value)
+        timeline = AnomalyTimeline(n_steps, len(plot_ids))
+        active = self.active
+        try:
+            for step in range(n_steps):
+                self._step = step
+                self.maybe_trigger_batch(plot_ids)
+                if not self.n_active:
+                    continue
+                for j, plot_id in enumerate(plot_ids):
+                    anomaly = active[plot_id]
+                    if anomaly is None:
+                        continue
+                    if anomaly.type in FREEZE_TYPES:
+                        # held from the step it started (every sensor is frozen)
+                        timeline.hold[step, j] = step - anomaly.step
+                    else:
+                        timeline.offsets[step, j] = anomaly.offsets[anomaly.step]
+                    self.end_step(plot_id)
+                    # the last step of an anomaly is not labelled
+                    if active[plot_id] is not None:
+                        timeline.labels[step, j] = anomaly.type
+        finally:
+            self._step = None
+        return timeline
+
+    @staticmethod
+    def apply_timeline(values, timeline):
+        """
+        Apply a planned timeline to values of shape (n_steps, n_plots, N_SENSORS)
+        in place: offsets in one add, frozen readings in one gather. Returns values.
+        """
+        values += timeline.offsets
+        steps, plots = np.nonzero(timeline.hold >= 0)
+        values[steps, plots] = values[timeline.hold[steps, plots], plots]
+        return values
+
+    def _start(self, plot_id):
+        anomaly, type_code = ENABLED_ANOMALIES[self.rng.integers(len(ENABLED_ANOMALIES))]
+        duration = int(self.rng.integers(3, 9))  # 3..8 steps
+        self.active[plot_id] = _ActiveAnomaly(type_code, duration, _roll_offsets(self.rng, type_code, duration))
+        self.n_active += 1
+        if self._n_log == len(self._log):
+            self._log = np.resize(self._log, 2 * len(self._log))
+        self._log[self._n_log] = (-1 if self._step is None else self._step, plot_id, type_code)
+        self._n_log += 1
+        self.scenarios_used.add(anomaly)
+        self._events.append(("START", plot_id, anomaly, self._step))
 
     # ----------------------------------------------------------
     # End step (decrement duration after all sensors processed)
     # ----------------------------------------------------------
     def end_step(self, plot_id):
-        if plot_id in self.active:
-            anomaly_type = self.active[plot_id]["type"]
-            self.active[plot_id]["duration"] -= 1
-            if self.active[plot_id]["duration"] <= 0:
-                print(f"✔ [ANOMALY END] Plot {plot_id}: {anomaly_type}")
-                del self.active[plot_id]
\ No newline at end of file
+        anomaly = self.active[plot_id]
+        if anomaly is not None:
+            anomaly.duration -= 1
+            anomaly.step += 1
+            if anomaly.duration <= 0:
+                self._events.append(("END", plot_id, config.ANOMALY_TYPES[anomaly.type], self._step))
+                self.active[plot_id] = None
+                self.n_active -= 1
+
+    # ----------------------------------------------------------
+    # Event output (kept out of the per-step hot path)
+    # ----------------------------------------------------------
+    def flush_events(self, until_step=None):
+        """
+        Log all buffered anomaly START/END events as one record, then clear them.
+        until_step: only write events of earlier steps (a planned run that stopped early).
+        """
+        if not self._events:
+            return
+        lines = [
+            f"🔥 [ANOMALY START] Plot {plot_id}: {name}" if kind == "START"
+            else f"✔ [ANOMALY END] Plot {plot_id}: {name}"
+            for kind, plot_id, name, step in self._events
+            if until_step is None or step is None or step < until_step
+        ]
+        if lines:
+            log.info("\n".join(lines))
+        self._events.clear()
@@ -1,5 +1,6 @@
 # config.py
 # (only the bottom part changed: we add SENSOR_DRIFT to ENABLED_ANOMALIES)
+import numpy as np
 
 # ======================================================
 # Plot configuration 
@@ -11,9 +12,11 @@ PLOT_IDS = [1,2, 3, 4]  # Must exist in database
 # Time configuration
 # ======================================================
 READING_INTERVAL_SEC = 1        # every 1 real second
+REALTIME = True                 # False (or --no-realtime): no sleep between steps (fast replay / dataset generation)
 MINUTES_PER_STEP = 5            # equals 5 minutes of simulated time
 TOTAL_SIM_MINUTES = 24 * 60     # simulate a full day
 START_DATE = "2025-01-01T06:00:00"  #Starting simulated datetime (ISO format)
+RANDOM_SEED = None              # int => reproducible run (same noise and anomaly offsets)
 
 # ======================================================
 # Normal base ranges
@@ -36,6 +39,25 @@ TEMP_NIGHT_LOW = 18      # coldest point
 HUM_DAY_LOW = 45
 HUM_NIGHT_HIGH = 75
 
+# Diurnal sine per hour (only 24 distinct values); humidity uses it shifted by 12h
+SIN24 = np.sin(2 * np.pi * np.arange(24) / 24)
+SIN24_INV = np.roll(SIN24, 12)
+
+# Precomputed curves, indexed by minute of day (hour resolution, as before)
+_HOURS = np.arange(DAY_LENGTH_MINUTES) // 60
+TEMP_CURVE = (
+    (TEMP_DAY_PEAK + TEMP_NIGHT_LOW) / 2
+    + (TEMP_DAY_PEAK - TEMP_NIGHT_LOW) / 2 * SIN24[_HOURS]
+)
+HUM_CURVE = (  # inverse cycle
+    (HUM_DAY_LOW + HUM_NIGHT_HIGH) / 2
+    + (HUM_NIGHT_HIGH - HUM_DAY_LOW) / 2 * SIN24_INV[_HOURS]
+)
+
+# Exponential smoothing of every sensor series:
+# small => very smooth, large => more reactive
+SMOOTHING_ALPHA = 0.1
+
 
 # ======================================================
 # Random noise (small variations)
@@ -63,4 +85,35 @@ ENABLED_ANOMALIES = [
     "SENSOR_FREEZE",
     "NOISE_INJECTION",
     "SENSOR_DRIFT",     # new gradual drift anomaly
-]
\ No newline at end of file
+]
+
+# ======================================================
+# Integer codes for hot-path dispatch
+# ======================================================
+TEMP, HUM, MOIST = 0, 1, 2
+N_SENSORS = 3
+
+ANOMALY_TYPES = (
+    "HIGH_TEMPERATURE",
+    "LOW_TEMPERATURE",
+    "HIGH_HUMIDITY",
+    "LOW_HUMIDITY",
+    "HIGH_MOISTURE",
+    "LOW_MOISTURE",
+    "SENSOR_FREEZE",
+    "NOISE_INJECTION",
+    "SENSOR_DRIFT",
+)
+(
+    HIGH_TEMPERATURE,
+    LOW_TEMPERATURE,
+    HIGH_HUMIDITY,
+    LOW_HUMIDITY,
+    HIGH_MOISTURE,
+    LOW_MOISTURE,
+    SENSOR_FREEZE,
+    NOISE_INJECTION,
+    SENSOR_DRIFT,
+) = range(len(ANOMALY_TYPES))
+N_TYPES = len(ANOMALY_TYPES)
+ANOMALY_CODES = {name: code for code, name in enumerate(ANOMALY_TYPES)}
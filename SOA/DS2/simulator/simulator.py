@@ -1,32 +1,53 @@
 # simulator.py
+import argparse
+import csv
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import math
+import queue
+import sys
+import threading
 import time
+import uuid
 import numpy as np
-import pandas as pd
-from faker import Faker
+from scipy.signal import lfilter
+try:
+    from numba import njit, prange  # compiled moisture recurrence
+except ImportError:
+    njit = None
+    prange = range
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 from dotenv import load_dotenv
 import SOA.DS2.simulator.config as config
-from anomaly_engine import AnomalyEngine
+from anomaly_engine import AnomalyEngine, EFFECTS
+
+log = logging.getLogger(__name__)
 
 # Force load .env located in the same folder as simulator.py
 ENV_PATH = os.path.join(os.path.dirname(__file__), ".env")
 load_dotenv(dotenv_path=ENV_PATH)
-print("=== RAW .env FILE CONTENT (binary)===")
-with open(ENV_PATH, "rb") as f:
-    print(f.read())
-print("====================================")
 
-print("DEBUG .env loaded from:", ENV_PATH)
-print("DEBUG SENSOR_ENDPOINT =", os.getenv("SENSOR_ENDPOINT"))
+# Opt-in only: the raw dump prints the tokens stored in .env
+SIMULATOR_DEBUG = os.getenv("SIMULATOR_DEBUG") == "1"
+if SIMULATOR_DEBUG:
+    print("=== RAW .env FILE CONTENT (binary)===")
+    with open(ENV_PATH, "rb") as f:
+        print(f.read())
+    print("====================================")
+
+    print("DEBUG .env loaded from:", ENV_PATH)
+    print("DEBUG SENSOR_ENDPOINT =", os.getenv("SENSOR_ENDPOINT"))
 
 # ------------------------------------------------------------
 # Load environment variables
 # ------------------------------------------------------------
 SENSOR_ENDPOINT = os.getenv("SENSOR_ENDPOINT", "").strip()
+SENSOR_BULK_ENDPOINT = os.getenv("SENSOR_BULK_ENDPOINT", "").strip()  # optional: one POST per step
 SIMULATOR_ACCESS_TOKEN = os.getenv("SIMULATOR_ACCESS_TOKEN", "").strip()
 SIMULATOR_REFRESH_TOKEN = os.getenv("SIMULATOR_REFRESH_TOKEN", "").strip()
 TOKEN_REFRESH_ENDPOINT = os.getenv("TOKEN_REFRESH_ENDPOINT", "").strip()
@@ -35,54 +56,118 @@ TOKEN_REFRESH_ENDPOINT = os.getenv("TOKEN_REFRESH_ENDPOINT", "").strip()
 ACCESS_TOKEN = SIMULATOR_ACCESS_TOKEN
 REFRESH_TOKEN = SIMULATOR_REFRESH_TOKEN
 
-print("DEBUG SENSOR_ENDPOINT repr:", repr(SENSOR_ENDPOINT))
-
-VALID_SENSOR_TYPES = {"TEMPERATURE", "HUMIDITY", "MOISTURE"}
-
-fake = Faker()
+if SIMULATOR_DEBUG:
+    print("DEBUG SENSOR_ENDPOINT repr:", repr(SENSOR_ENDPOINT))
+
+VALID_SENSOR_TYPES = frozenset(("TEMPERATURE", "HUMIDITY", "MOISTURE"))  # names the API accepts
+
+# Sender threads for per-reading posts: one per (plot, sensor) stream when the
+# pool allows, so every reading of a step (3 per plot) can be in flight at once
+API_POOL_SIZE = 32
+API_WORKERS = min(API_POOL_SIZE, 3 * len(config.PLOT_IDS))
+
+# One keep-alive session for every API call (pooled connections, no
+# TCP handshake per reading). Only failed connects are retried: a POST
+# that reached the server is never resent, so readings are not duplicated
+SESSION = requests.Session()
+_retry = Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.2)
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=API_POOL_SIZE, max_retries=_retry)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+# Every request is JSON with the bearer token; refresh_token()/login_and_get_tokens()
+# update the Authorization header when the token changes
+SESSION.headers.update({"Content-Type": "application/json", "Authorization": f"Bearer {ACCESS_TOKEN}"})
+
+# Readings queued by send_to_api() when SENSOR_BULK_ENDPOINT is set
+pending_payloads = []
+
+# API calls are handed to sender threads through bounded queues, one per
+# sender, so the simulation loop never waits on the network; when a queue is
+# full the loop blocks until its sender catches up instead of buffering
+# without limit (senders <= pool_maxsize, so each has its own pooled connection).
+# Each (plot, sensor) stream always goes through the same queue, so its
+# readings reach the server in order (the detector's rolling windows follow
+# arrival order). Filled by start_senders()
+SEND_QUEUE_SIZE = 10_000  # shared by all the queues
+SEND_QUEUES = []
+
+# Single random generator for all simulated noise (see config.RANDOM_SEED)
+rng = np.random.default_rng(config.RANDOM_SEED)
+
+# Graph history is stored as int16 hundredths (0.01 resolution, range ±327.67)
+HISTORY_SCALE = 100
+
+def to_history(values):
+    # one scratch array, rounded and clamped to the int16 range in place
+    scaled = np.multiply(values, HISTORY_SCALE)
+    np.rint(scaled, out=scaled)
+    np.maximum(scaled, -32768, out=scaled)
+    np.minimum(scaled, 32767, out=scaled)
+    return scaled.astype(np.int16)
+
+# Ground-truth CSV layout (read by evaluate_isolation_forest.py and plot_sensor_data.py)
+GT_CSV_PATH = "ground_truth_anomalies.csv"
+GT_HEADER = ("timestamp", "plot", "sensor_type", "value", "is_anomaly", "anomaly_type")
+SENSOR_TYPE_NAMES = ("TEMPERATURE", "HUMIDITY", "MOISTURE")  # config.TEMP/HUM/MOIST order
+# Checked once here, so payloads are built from these names without per-reading validation
+if not VALID_SENSOR_TYPES.issuperset(SENSOR_TYPE_NAMES):
+    raise ValueError(f"Unknown sensor types: {set(SENSOR_TYPE_NAMES) - VALID_SENSOR_TYPES}")
+
+# Anomaly type name -> (temperature, humidity, moisture) ground-truth flags,
+# taken from the EFFECTS table the anomaly engine applies
+ANOM_FLAGS = {
+    name: tuple(int((code, sensor) in EFFECTS) for sensor in (config.TEMP, config.HUM, config.MOIST))
+    for name, code in config.ANOMALY_CODES.items()
+}
+ANOM_FLAGS["NONE"] = (0, 0, 0)
 
 # ------------------------------------------------------------
-# Temperature cycle using NumPy
+# Temperature cycle using NumPy (row = step, column = plot)
 # ------------------------------------------------------------
-def generate_temperature(current_time):
-    hour = current_time.hour
-    angle = 2 * np.pi * hour / 24 
-    mid = (config.TEMP_DAY_PEAK + config.TEMP_NIGHT_LOW) / 2
-    amp = (config.TEMP_DAY_PEAK - config.TEMP_NIGHT_LOW) / 2
-    noise = np.random.uniform(-config.TEMP_NOISE_MAX, config.TEMP_NOISE_MAX)
-    return mid + amp * np.sin(angle) + noise
+def generate_temperature(minute_of_day, n_plots):
+    # noise buffer doubles as the output: the curve is added in place
+    out = rng.uniform(-config.TEMP_NOISE_MAX, config.TEMP_NOISE_MAX, size=(len(minute_of_day), n_plots))
+    np.add(out, config.TEMP_CURVE[minute_of_day][:, None], out=out)
+    return out
 
 # ------------------------------------------------------------
-# Humidity inverse cycle using NumPy
+# Humidity inverse cycle using NumPy (row = step, column = plot)
 # ------------------------------------------------------------
-def generate_humidity(current_time):
-    hour = (current_time.hour + 12) % 24  # Inverse cycle
-    angle = 2 * np.pi * hour / 24
-    mid = (config.HUM_DAY_LOW + config.HUM_NIGHT_HIGH) / 2
-    amp = (config.HUM_NIGHT_HIGH - config.HUM_DAY_LOW) / 2
-    noise = np.random.uniform(-config.HUM_NOISE_MAX, config.HUM_NOISE_MAX)
-    return mid + amp * np.sin(angle) + noise
+def generate_humidity(minute_of_day, n_plots):
+    # curve already inverted
+    out = rng.uniform(-config.HUM_NOISE_MAX, config.HUM_NOISE_MAX, size=(len(minute_of_day), n_plots))
+    np.add(out, config.HUM_CURVE[minute_of_day][:, None], out=out)
+    return out
 
 # ------------------------------------------------------------
-# Moisture drift using NumPy
+# Moisture drift + smoothing for the whole run (row = step, column = plot)
 # ------------------------------------------------------------
-def generate_moisture(current):
-    # slow natural drying
-    drift = np.random.uniform(-0.2, -0.05)
-    noise = np.random.uniform(-config.MOISTURE_NOISE_MAX, config.MOISTURE_NOISE_MAX)
-    new_value = current + drift + noise
-    return np.clip(new_value, config.BASE_MOISTURE_RANGE[0], config.BASE_MOISTURE_RANGE[1])
+def simulate_moisture(init, drift_noise, lo, hi, alpha):
+    # slow natural drying, clipped to [lo, hi], then smoothed against the
+    # previous level; the clip makes this a recurrence lfilter cannot do
+    out = np.empty_like(drift_noise)
+    for p in prange(drift_noise.shape[1]):
+        prev = init[p]
+        for t in range(drift_noise.shape[0]):
+            raw = min(max(prev + drift_noise[t, p], lo), hi)
+            prev = alpha * raw + (1 - alpha) * prev
+            out[t, p] = prev
+    return out
+
+if njit is not None:
+    # cache=True: compiled once, reused from __pycache__ on later runs
+    simulate_moisture = njit(parallel=True, fastmath=True, cache=True)(simulate_moisture)
 
 # ------------------------------------------------------------
 # Simple smoothing to avoid unrealistic jumps
 # ------------------------------------------------------------
-def smooth(prev, new, alpha=0.2):
+def smooth_series(raw, alpha=config.SMOOTHING_ALPHA):
     """
-    Exponential smoothing: alpha small => very smooth, alpha large => more reactive.
+    Exponential smoothing down axis 0 of a whole series in one pass:
+    y[0] = raw[0], y[t] = alpha * raw[t] + (1 - alpha) * y[t-1].
     """
-    if prev is None:
-        return new
-    return alpha * new + (1 - alpha) * prev
+    series, _ = lfilter([alpha], [1, -(1 - alpha)], raw, axis=0, zi=(1 - alpha) * raw[:1])
+    return series
 
 # ------------------------------------------------------------
 # Refresh token function
@@ -96,249 +181,413 @@ def login_and_get_tokens():
         "password": os.getenv("SIMULATOR_PASSWORD", "lolo2020")
     }
     try:
-        response = requests.post(login_url, json=payload)
+        response = SESSION.post(login_url, data=orjson.dumps(payload))
         response.raise_for_status()
         data = response.json()
         ACCESS_TOKEN = data["access"]
         REFRESH_TOKEN = data["refresh"]
-        print("✅ Fresh tokens obtained via login")
+        SESSION.headers["Authorization"] = f"Bearer {ACCESS_TOKEN}"
+        log.info("✅ Fresh tokens obtained via login")
         return True
     except Exception as e:
-        print(f"❌ Failed to login for tokens: {e}")
+        log.error("❌ Failed to login for tokens: %s", e)
         return False
 
 # Improve refresh_token() to fallback to login
 def refresh_token():
     global ACCESS_TOKEN
     if not REFRESH_TOKEN:
-        print("⚠ No refresh token — attempting direct login")
+        log.warning("⚠ No refresh token — attempting direct login")
         return login_and_get_tokens()
 
     payload = {"refresh": REFRESH_TOKEN}
     try:
-        response = requests.post(TOKEN_REFRESH_ENDPOINT, json=payload)
+        response = SESSION.post(TOKEN_REFRESH_ENDPOINT, data=orjson.dumps(payload))
         response.raise_for_status()
         data = response.json()
         ACCESS_TOKEN = data.get('access', '')
-        print("✅ Access token refreshed")
+        SESSION.headers["Authorization"] = f"Bearer {ACCESS_TOKEN}"
+        log.info("✅ Access token refreshed")
         return True
     except Exception as e:
-        print(f"❌ Refresh failed ({e}) — falling back to login")
+        log.error("❌ Refresh failed (%s) — falling back to login", e)
         return login_and_get_tokens()
+
+# Sends run on sender threads, so several can hit a 401 at once
+TOKEN_LOCK = threading.Lock()
+
+def refresh_token_once(used_token):
+    """
+    refresh_token() for a sender whose request with used_token got a 401.
+    Only the first sender refreshes; the others find ACCESS_TOKEN already
+    replaced and just retry with it.
+    """
+    with TOKEN_LOCK:
+        if ACCESS_TOKEN != used_token:
+            return True
+        return refresh_token()
+
 # ------------------------------------------------------------
 # Send to API with refresh on 401
 # ------------------------------------------------------------
-def send_to_api(plot_id, sensor_type, value, current_time):
-    if not SENSOR_ENDPOINT:
-        print("⚠ SENSOR_ENDPOINT not set in .env — skipping API send.")
-        return
-
+def send_to_api(plot_id, sensor_type, value, ts_iso):
+    # ts_iso: the step's simulated time, already in ISO format
     payload = {
         "plot": plot_id,
         "sensor_type": sensor_type,
         "value": value,
-        "simulated_time": current_time.isoformat()
+        "simulated_time": ts_iso
     }
 
-    headers = {"Authorization": f"Bearer {ACCESS_TOKEN}"}
+    if SENSOR_BULK_ENDPOINT:
+        pending_payloads.append(payload)  # sent by flush_to_api()
+        return
+
+    post_reading(payload)
+
+# ------------------------------------------------------------
+# Post one reading to the single-record endpoint
+# ------------------------------------------------------------
+def post_reading(payload):
+    plot_id = payload["plot"]
+    sensor_type = payload["sensor_type"]
+
+    if not SENSOR_ENDPOINT:
+        log.warning("⚠ SENSOR_ENDPOINT not set in .env — skipping API send.")
+        return
+
+    # Encoded once with orjson (also reused by the retry below)
+    data = orjson.dumps(payload)
+    used_token = ACCESS_TOKEN
 
     try:
-        response = requests.post(SENSOR_ENDPOINT, json=payload, headers=headers)
+        response = SESSION.post(SENSOR_ENDPOINT, data=data)
         response.raise_for_status()
-        print(f"✅ Sent {sensor_type} for Plot {plot_id} → {response.status_code}")
+        log.debug("✅ Sent %s for Plot %s → %s", sensor_type, plot_id, response.status_code)
     except requests.exceptions.RequestException as e:
         # Catch ConnectionError, Timeout, HTTPError, etc.
         if isinstance(e, requests.exceptions.HTTPError) and hasattr(e, 'response') and e.response.status_code == 401:
-            if refresh_token():
-                headers["Authorization"] = f"Bearer {ACCESS_TOKEN}"
+            if refresh_token_once(used_token):
                 try:
-                    response = requests.post(SENSOR_ENDPOINT, json=payload, headers=headers)
+                    response = SESSION.post(SENSOR_ENDPOINT, data=data)
                     response.raise_for_status()
-                    print(f"✅ Retried after refresh: Sent {sensor_type} for Plot {plot_id} → {response.status_code}")
+                    log.info("✅ Retried after refresh: Sent %s for Plot %s → %s", sensor_type, plot_id, response.status_code)
                 except requests.exceptions.RequestException as retry_e:
-                     print(f"❌ Retry failed for {sensor_type}: {retry_e}")
+                     log.error("❌ Retry failed for %s: %s", sensor_type, retry_e)
             else:
-                print(f"❌ Refresh failed for {sensor_type} — update .env and rerun.")
+                log.error("❌ Refresh failed for %s — update .env and rerun.", sensor_type)
         else:
             # Just print error and continue (don't crash simulation)
-            print(f"⚠ API Error (Plot {plot_id} {sensor_type}): {e}")
+            log.warning("⚠ API Error (Plot %s %s): %s", plot_id, sensor_type, e)
 
 # ------------------------------------------------------------
-# Main simulation loop
+# Send a batch of readings in one request (bulk endpoint)
 # ------------------------------------------------------------
-def run_simulator():
-    anomaly_engine = AnomalyEngine()
+def post_readings(readings):
+    body = {"readings": readings}
+    count = len(readings)
+
+    data = orjson.dumps(body)
+    used_token = ACCESS_TOKEN
 
-    # Initialize data trackers
-    ground_truth = []  # <--- NEW: Track ground truth for evaluation
-    temperature_data = {p: [] for p in config.PLOT_IDS}
-    humidity_data = {p: [] for p in config.PLOT_IDS}
-    moisture_data = {p: [] for p in config.PLOT_IDS}
-    moisture_levels = {p: np.random.uniform(*config.BASE_MOISTURE_RANGE) for p in config.PLOT_IDS}
-    device_ids = {p: fake.uuid4() if config.USE_FAKE_DEVICE_IDS else None for p in config.PLOT_IDS}
-
-    # Time tracking
-    current_time = datetime.fromisoformat(config.START_DATE)  # Start at configured datetime
-    time_points = []  # List of datetimes for plotting
-
-    # Simulate until total minutes reached (now in hourly steps)
     try:
-        while (current_time - datetime.fromisoformat(config.START_DATE)).total_seconds() / 60 < config.TOTAL_SIM_MINUTES:
-            print(f"\n⏱ Simulated time: {current_time}")
-            time_points.append(current_time)
-
-            for plot in config.PLOT_IDS:
-                # Generate base values (pass current_time)
-                raw_temp = generate_temperature(current_time)
-                prev_temp = temperature_data[plot][-1] if temperature_data[plot] else None
-                base_temp = smooth(prev_temp, raw_temp, alpha=0.1)
-
-                raw_hum = generate_humidity(current_time)
-                prev_hum = humidity_data[plot][-1] if humidity_data[plot] else None
-                base_hum = smooth(prev_hum, raw_hum, alpha=0.1)
-
-                raw_moisture = generate_moisture(moisture_levels[plot])
-                base_moisture = smooth(moisture_levels[plot], raw_moisture, alpha=0.1)
-                moisture_levels[plot] = base_moisture
-
-                # Try to start an anomaly
-                anomaly_engine.maybe_trigger(plot)
-
-                # Apply anomalies (if any)
-                temp = anomaly_engine.apply(plot, "temperature", base_temp)
-                hum = anomaly_engine.apply(plot, "humidity", base_hum)
-                moisture_levels[plot] = anomaly_engine.apply(plot, "moisture", moisture_levels[plot])
-
-                # Save for graph
-                temperature_data[plot].append(temp)
-                humidity_data[plot].append(hum)
-                moisture_data[plot].append(moisture_levels[plot])
-
-                # Console output
-                print(
-                    f"Plot {plot} | Device: {device_ids[plot]} → "
-                    f"Temp: {temp:.2f}°C | Humidity: {hum:.2f}% | Moisture: {moisture_levels[plot]:.2f}%"
-                )
-
-                # Send to API with current_time
-                send_to_api(plot, "TEMPERATURE", temp, current_time)
-                send_to_api(plot, "HUMIDITY", hum, current_time)
-                send_to_api(plot, "MOISTURE", moisture_levels[plot], current_time)
-
-                # End anomaly step after all sensors processed
-                anomaly_engine.end_step(plot)
-
-                # --------------------------------------------------------
-                # Capture Ground Truth
-                # --------------------------------------------------------
-                # Check if there is an active anomaly for this plot
-                active_anomaly = anomaly_engine.active.get(plot)
-                anomaly_type = active_anomaly["type"] if active_anomaly else "NONE"
-                
-                # Determine if specific sensors are anomalous based on the type
-                # (Logic matches anomaly_engine.apply)
-                is_temp_anom = 1 if anomaly_type in ["HIGH_TEMPERATURE", "LOW_TEMPERATURE", "SENSOR_FREEZE", "NOISE_INJECTION", "SENSOR_DRIFT"] else 0
-                is_hum_anom = 1 if anomaly_type in ["HIGH_HUMIDITY", "LOW_HUMIDITY", "SENSOR_FREEZE", "NOISE_INJECTION", "SENSOR_DRIFT"] else 0
-                is_moist_anom = 1 if anomaly_type in ["HIGH_MOISTURE", "LOW_MOISTURE", "SENSOR_FREEZE", "NOISE_INJECTION", "SENSOR_DRIFT"] else 0
-                
-                # Append rows (one per sensor type per timestamp)
-                ground_truth.append({
-                    "timestamp": current_time,
-                    "plot": plot,
-                    "sensor_type": "TEMPERATURE",
-                    "value": temp,
-                    "is_anomaly": is_temp_anom,
-                    "anomaly_type": anomaly_type if is_temp_anom else "NONE"
-                })
-                ground_truth.append({
-                    "timestamp": current_time,
-                    "plot": plot,
-                    "sensor_type": "HUMIDITY",
-                    "value": hum,
-                    "is_anomaly": is_hum_anom,
-                    "anomaly_type": anomaly_type if is_hum_anom else "NONE"
-                })
-                ground_truth.append({
-                    "timestamp": current_time,
-                    "plot": plot,
-                    "sensor_type": "MOISTURE",
-                    "value": moisture_levels[plot],
-                    "is_anomaly": is_moist_anom,
-                    "anomaly_type": anomaly_type if is_moist_anom else "NONE"
-                })
-
-            current_time += timedelta(minutes=config.MINUTES_PER_STEP)
-            time.sleep(config.READING_INTERVAL_SEC)
-            
-    except KeyboardInterrupt:
-        print("\n🛑 Simulation stopped by user. Saving data...")
-        
-    finally:
-        # ------------------------------------------------------------
-        # Export Ground Truth CSV
-        # ------------------------------------------------------------
-        if ground_truth:
-            df_gt = pd.DataFrame(ground_truth)
-            df_gt.to_csv("ground_truth_anomalies.csv", index=False)
-            print("✅ Exported ground_truth_anomalies.csv with true injected anomalies")
+        response = SESSION.post(SENSOR_BULK_ENDPOINT, data=data)
+        response.raise_for_status()
+        log.debug("✅ Sent %d readings → %s", count, response.status_code)
+    except requests.exceptions.RequestException as e:
+        if isinstance(e, requests.exceptions.HTTPError) and hasattr(e, 'response') and e.response.status_code == 401:
+            if refresh_token_once(used_token):
+                try:
+                    response = SESSION.post(SENSOR_BULK_ENDPOINT, data=data)
+                    response.raise_for_status()
+                    log.info("✅ Retried after refresh: Sent %d readings → %s", count, response.status_code)
+                except requests.exceptions.RequestException as retry_e:
+                    log.error("❌ Retry failed for batch of %d: %s", count, retry_e)
+            else:
+                log.error("❌ Refresh failed for batch of %d — update .env and rerun.", count)
+        elif isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 400:
+            # The whole batch is rejected if one reading is invalid:
+            # resend one by one so the valid readings still get stored
+            log.warning("⚠ Batch of %d rejected (%s) — sending readings one by one", count, e)
+            for reading in readings:
+                post_reading(reading)
         else:
-            print("⚠ No ground truth data collected.")
+            # Just print error and continue (don't crash simulation)
+            log.warning("⚠ API Error (batch of %d): %s", count, e)
+
+# ------------------------------------------------------------
+# Hand the queued readings to a sender thread
+# ------------------------------------------------------------
+def flush_to_api():
+    """Queue pending_payloads as one post_readings() call (nothing if empty)."""
+    if not pending_payloads:
+        return
+
+    # Snapshot here, on the simulation thread, before the next step queues more
+    batch = pending_payloads[:]
+    pending_payloads.clear()
+    SEND_QUEUES[0].put((post_readings, (batch,)))
 
-        # ------------------------------------------------------------
-        # Plot graphs after simulation ends
-        # ------------------------------------------------------------
+# ------------------------------------------------------------
+# Sender threads: post whatever the simulation loop queues
+# ------------------------------------------------------------
+def _sender(send_queue):
+    while True:
+        item = send_queue.get()
         try:
-            colors = {p: c for p, c in zip(config.PLOT_IDS, ["tab:blue", "tab:orange", "tab:green", "tab:red"])}
-
-            # Temperature
-            plt.figure(figsize=(12, 5))
-            for plot in config.PLOT_IDS:
-                if temperature_data[plot]:
-                    plt.plot(time_points[:len(temperature_data[plot])], temperature_data[plot], label=f"Plot {plot}", color=colors[plot])
-            plt.xlabel("Simulated Hours")
-            plt.ylabel("Temperature (°C)")
-            plt.title("Temperature per Plot")
-            plt.legend()
-            plt.grid(True)
-            plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))  # Format as hours:minutes
-            plt.gca().xaxis.set_major_locator(mdates.HourLocator(interval=1))  # Tick every hour
-            plt.gcf().autofmt_xdate()  # Rotate dates for readability
-            plt.savefig("temperature_simulation_per_plot.png")
-
-            # Humidity
-            plt.figure(figsize=(12, 5))
-            for plot in config.PLOT_IDS:
-                if humidity_data[plot]:
-                    plt.plot(time_points[:len(humidity_data[plot])], humidity_data[plot], label=f"Plot {plot}", color=colors[plot])
-            plt.xlabel("Simulated Hours")
-            plt.ylabel("Humidity (%)")
-            plt.title("Humidity per Plot")
-            plt.legend()
-            plt.grid(True)
-            plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-            plt.gca().xaxis.set_major_locator(mdates.HourLocator(interval=1))
-            plt.gcf().autofmt_xdate()
-            plt.savefig("humidity_simulation_per_plot.png")
-
-            # Moisture
-            plt.figure(figsize=(12, 5))
-            for plot in config.PLOT_IDS:
-                if moisture_data[plot]:
-                    plt.plot(time_points[:len(moisture_data[plot])], moisture_data[plot], label=f"Plot {plot}", color=colors[plot])
-            plt.xlabel("Simulated Hours")
-            plt.ylabel("Moisture (%)")
-            plt.title("Moisture per Plot")
-            plt.legend()
-            plt.grid(True)
-            plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-            plt.gca().xaxis.set_major_locator(mdates.HourLocator(interval=1))
-            plt.gcf().autofmt_xdate()
-            plt.savefig("moisture_simulation_per_plot.png")
-            
-            print("✅ Plots saved.")
+            if item is None:  # stop_senders() sentinel
+                return
+            func, args = item
+            func(*args)
         except Exception as e:
-            print(f"⚠ Could not save plots: {e}")
+            log.warning("⚠ API sender failed: %s", e)
+        finally:
+            send_queue.task_done()
+
+def start_senders(count):
+    """Start count senders, each draining its own queue in SEND_QUEUES."""
+    SEND_QUEUES[:] = [queue.Queue(maxsize=max(1, SEND_QUEUE_SIZE // count)) for _ in range(count)]
+    senders = [
+        threading.Thread(target=_sender, args=(send_queue,), name=f"api-sender-{i}", daemon=True)
+        for i, send_queue in enumerate(SEND_QUEUES)
+    ]
+    for sender in senders:
+        sender.start()
+    return senders
+
+def stop_senders(senders):
+    """Let the senders finish everything already queued, then end them."""
+    for send_queue in SEND_QUEUES:
+        send_queue.put(None)
+    for sender in senders:
+        sender.join()
+
+# ------------------------------------------------------------
+# Graphs of the simulated history (one PNG, one row per sensor)
+# ------------------------------------------------------------
+def save_plots(time_points, temperature_data, humidity_data, moisture_data):
+    """History arrays are (steps, plots) in HISTORY_SCALE units, one row per time point."""
+    # matplotlib is only imported when a figure is actually drawn
+    import matplotlib
+    matplotlib.use("Agg")  # figures are only saved to PNG; no GUI backend
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+
+    try:
+        colors = ["tab:blue", "tab:orange", "tab:green", "tab:red"]
+        labels = [f"Plot {plot}" for plot in config.PLOT_IDS]
+        x = mdates.date2num(time_points)  # datetime64 array, converted once for all three axes
+
+        # One figure, one row per sensor, sharing the time axis
+        fig, (ax_t, ax_h, ax_m) = plt.subplots(3, 1, figsize=(12, 12), sharex=True)
+        for ax, history, ylabel, title in (
+            (ax_t, temperature_data, "Temperature (°C)", "Temperature per Plot"),
+            (ax_h, humidity_data, "Humidity (%)", "Humidity per Plot"),
+            (ax_m, moisture_data, "Moisture (%)", "Moisture per Plot"),
+        ):
+            if len(history):
+                # one call per axis: each (steps, plots) column becomes a line
+                ax.set_prop_cycle(color=colors)
+                ax.plot(x, history / HISTORY_SCALE, label=labels)
+            ax.set_ylabel(ylabel)
+            ax.set_title(title)
+            ax.legend()
+            ax.grid(True)
+
+        # Shared x axis: formatter/locator set once on the bottom axis
+        ax_m.set_xlabel("Simulated Hours")
+        ax_m.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))  # Format as hours:minutes
+        ax_m.xaxis.set_major_locator(mdates.HourLocator(interval=1))  # Tick every hour
+        fig.autofmt_xdate()  # Rotate dates for readability
+        fig.savefig("sensors_simulation.png")
+        plt.close(fig)
+
+        log.info("✅ Plots saved.")
+    except Exception as e:
+        log.warning("⚠ Could not save plots: %s", e)
+
+# ------------------------------------------------------------
+# Main simulation loop
+# ------------------------------------------------------------
+def run_simulator(with_plots=True):
+    anomaly_engine = AnomalyEngine(rng)
+
+    # Initialize data trackers
+    n_plots = len(config.PLOT_IDS)
+    n_steps = math.ceil(config.TOTAL_SIM_MINUTES / config.MINUTES_PER_STEP)
+
+    # Temperature and humidity only depend on the time of day, so their
+    # smoothed series is generated for the whole run up front
+    start_time = datetime.fromisoformat(config.START_DATE)
+    step_delta = timedelta(minutes=config.MINUTES_PER_STEP)
+    start_minute = start_time.hour * 60 + start_time.minute
+    minute_of_day = (start_minute + np.arange(n_steps) * config.MINUTES_PER_STEP) % config.DAY_LENGTH_MINUTES
+    temp_series = smooth_series(generate_temperature(minute_of_day, n_plots))
+    hum_series = smooth_series(generate_humidity(minute_of_day, n_plots))
+
+    # Moisture as well: random start level, drift + noise per step
+    moisture_drift_noise = rng.uniform(-0.2, -0.05, size=(n_steps, n_plots))
+    moisture_drift_noise += rng.uniform(-config.MOISTURE_NOISE_MAX, config.MOISTURE_NOISE_MAX, size=(n_steps, n_plots))
+    moisture_series = simulate_moisture(
+        rng.uniform(*config.BASE_MOISTURE_RANGE, size=n_plots),
+        moisture_drift_noise,
+        float(config.BASE_MOISTURE_RANGE[0]),
+        float(config.BASE_MOISTURE_RANGE[1]),
+        config.SMOOTHING_ALPHA,
+    )
+
+    # Anomalies for the whole run, applied in one pass:
+    # readings[step, plot position, sensor code]
+    plot_ids = tuple(config.PLOT_IDS)
+    timeline = anomaly_engine.plan(n_steps, plot_ids)
+    readings = anomaly_engine.apply_timeline(
+        np.stack((temp_series, hum_series, moisture_series), axis=2), timeline
+    )
+    labels = timeline.labels
+
+    # History for the graphs: row = step, column = plot, in HISTORY_SCALE units
+    # (plotting only; the readings and the CSV values stay float64)
+    temperature_data = to_history(readings[:, :, config.TEMP])
+    humidity_data = to_history(readings[:, :, config.HUM])
+    moisture_data = to_history(readings[:, :, config.MOIST])
+    steps_done = 0  # completed steps (what the graphs and summary cover)
+
+    # Indexed by plot position (same order as config.PLOT_IDS)
+    device_ids = tuple(str(uuid.uuid4()) if config.USE_FAKE_DEVICE_IDS else None for _ in config.PLOT_IDS)
+
+    # Time tracking: step times for plotting, built in one go (datetime64, no per-step append)
+    time_points = np.datetime64(start_time) + np.arange(n_steps) * np.timedelta64(config.MINUTES_PER_STEP, "m")
+
+    # Names the loop uses every step, looked up once (locals, not module/attribute lookups)
+    anomaly_types = config.ANOMALY_TYPES
+    realtime, interval = config.REALTIME, config.READING_INTERVAL_SEC
+    bulk = bool(SENSOR_BULK_ENDPOINT)
+
+    # Ground truth for evaluation, streamed to CSV one step at a time
+    # (one row per reading, 3 per plot per step) so memory stays flat on long runs
+    with open(GT_CSV_PATH, "w", newline="", buffering=1 << 20) as gt_file:
+        gt_writer = csv.writer(gt_file, lineterminator="\n")  # same line endings as the old to_csv
+        gt_writer.writerow(GT_HEADER)
+        gt_rows = 0
+
+        # A single sender in bulk mode keeps the step batches in order
+        senders = start_senders(1 if bulk else API_WORKERS)
+        # Per-reading mode: stream_puts[plot position][sensor code] queues a reading
+        # on the sender that owns its (plot, sensor) stream
+        stream_puts = tuple(
+            tuple(SEND_QUEUES[(i * len(SENSOR_TYPE_NAMES) + code) % len(SEND_QUEUES)].put
+                  for code in range(len(SENSOR_TYPE_NAMES)))
+            for i in range(n_plots)
+        )
+
+        # Simulate until total minutes reached (n_steps steps of MINUTES_PER_STEP)
+        try:
+            for step_idx in range(n_steps):
+                current_time = start_time + step_idx * step_delta
+                log.debug("⏱ Simulated time: %s", current_time)
+                ts_iso = current_time.isoformat()  # shared by every reading of this step
+                ts_csv = str(current_time)  # CSV timestamp, formatted once instead of per row
+                step_rows = []
+
+                # This step's readings (anomalies already applied) and ground-truth labels
+                step_values = readings[step_idx].tolist()
+                step_labels = labels[step_idx].tolist()
+
+                for i, plot in enumerate(plot_ids):
+                    temp, hum, moisture = step_values[i]
+
+                    # Per-plot readings (DEBUG level)
+                    log.debug(
+                        "Plot %s | Device: %s → Temp: %.2f°C | Humidity: %.2f%% | Moisture: %.2f%%",
+                        plot, device_ids[i], temp, hum, moisture,
+                    )
+
+                    # Send to API with the step time (queued for the bulk request, or posted by a sender thread)
+                    for put, sensor_type, value in zip(stream_puts[i], SENSOR_TYPE_NAMES, step_values[i]):
+                        if bulk:
+                            send_to_api(plot, sensor_type, value, ts_iso)
+                        else:
+                            put((send_to_api, (plot, sensor_type, value, ts_iso)))
+
+                    # --------------------------------------------------------
+                    # Capture Ground Truth
+                    # --------------------------------------------------------
+                    # Anomaly still active on this plot after the step (see AnomalyEngine.plan)
+                    label = step_labels[i]
+                    anomaly_type = anomaly_types[label] if label >= 0 else "NONE"
+
+                    # Which sensors this anomaly affects (logic matches anomaly_engine.apply)
+                    flags = ANOM_FLAGS[anomaly_type]
+
+                    # Rows (one per sensor type per timestamp)
+                    for sensor_type, value, flag in zip(SENSOR_TYPE_NAMES, (temp, hum, moisture), flags):
+                        step_rows.append((ts_csv, plot, sensor_type, value, flag, anomaly_type if flag else "NONE"))
+
+                gt_writer.writerows(step_rows)
+                gt_rows += len(step_rows)
+
+                flush_to_api()  # one request for the step (bulk endpoint only)
+
+                steps_done = step_idx + 1
+                if realtime:
+                    time.sleep(interval)
+
+        except KeyboardInterrupt:
+            log.info("🛑 Simulation stopped by user. Saving data...")
+
+        finally:
+            flush_to_api()
+            stop_senders(senders)
+            # The timeline was planned for the whole run: report only the steps simulated
+            anomaly_engine.flush_events(until_step=steps_done)
+            n_injected = int(np.count_nonzero(anomaly_engine.log["step"] < steps_done))
+            log.info("🏁 Simulated %d steps for %d plots, %d anomalies injected", steps_done, n_plots, n_injected)
+
+            # ------------------------------------------------------------
+            # Export Ground Truth CSV
+            # ------------------------------------------------------------
+            gt_file.close()  # complete on disk before the plots are drawn
+            if gt_rows:
+                log.info("✅ Exported %s with true injected anomalies", GT_CSV_PATH)
+            else:
+                log.warning("⚠ No ground truth data collected.")
+
+            # ------------------------------------------------------------
+            # Plot graphs after simulation ends (skipped with --no-plot)
+            # ------------------------------------------------------------
+            if with_plots:
+                save_plots(time_points[:steps_done], temperature_data[:steps_done],
+                           humidity_data[:steps_done], moisture_data[:steps_done])
 
 
 if __name__ == "__main__":
-    run_simulator()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Simulate plot sensors and stream the readings to the API.")
+    parser.add_argument(
+        "--no-realtime",
+        action="store_true",
+        help="replay as fast as possible (no sleep between steps), e.g. to build a dataset",
+    )
+    parser.add_argument(
+        "--no-plot",
+        action="store_true",
+        help="skip the sensors_simulation.png figure (the ground-truth CSV is still written)",
+    )
+    args = parser.parse_args()
+    if args.no_realtime:
+        config.REALTIME = False
+
+    # Per-step and per-reading output is DEBUG; SIMULATOR_LOG_LEVEL=DEBUG shows it.
+    # Records are queued and written to the terminal by a listener thread,
+    # so the loop (and the API senders) never block on console I/O
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))  # stdout, so the output can be piped
+    logging.basicConfig(
+        level=os.getenv("SIMULATOR_LOG_LEVEL", "INFO").upper(),
+        format="%(message)s",  # applied by the QueueHandler, before the record is queued
+        handlers=[QueueHandler(log_queue)],
+    )
+    listener.start()
+    try:
+        run_simulator(with_plots=not args.no_plot)
+    finally:
+        listener.stop()  # writes out whatever is still queued
\ No newline at end of file